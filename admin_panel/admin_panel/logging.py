@@ -13,6 +13,7 @@ import warnings
 from collections import deque
 from datetime import datetime
 from typing import Self, Sequence, TypedDict, cast
+from weakref import WeakKeyDictionary
 
 import discord
 from discord.ui import Container, TextDisplay
@@ -133,7 +134,8 @@ class DequeHandler(logging.Handler):
     This means the handler will keep at most `maxlen` log records and discard old records as new one comes, without
     discarding the entire buffer. There is also no flushing mechanism.
 
-    The usage of this handler is to display the recent logs from the application.
+    The usage of this handler is to display the recent logs from the application. Emitting only appends the record,
+    they are formatted when read through `lines`, once per record.
     """
 
     maxlen: int = 50
@@ -141,10 +143,36 @@ class DequeHandler(logging.Handler):
     def __init__(self, level: int | str = 0) -> None:
         super().__init__(level)
         self.deque: deque[logging.LogRecord] = deque(maxlen=self.maxlen)
+        # lines already formatted by `lines`, entries go away with their records
+        self._formatted: WeakKeyDictionary[logging.LogRecord, str] = WeakKeyDictionary()
 
     def emit(self, record: logging.LogRecord) -> None:
         self.deque.append(record)
 
+    def lines(self) -> list[str]:
+        """
+        Return the buffered records formatted, oldest first. A record is only formatted the first time it is read.
+        """
+        # logging threads append under the handler lock, take a consistent snapshot
+        self.acquire()
+        try:
+            records = list(self.deque)
+        finally:
+            self.release()
+
+        lines: list[str] = []
+        for record in records:
+            line = self._formatted.get(record)
+            if line is None:
+                try:
+                    line = self.format(record)
+                except Exception:
+                    self.handleError(record)
+                    line = str(record.msg)
+                self._formatted[record] = line
+            lines.append(line)
+        return lines
+
 
 def setup_logging(config: dict):
     logging.config.dictConfig(config)
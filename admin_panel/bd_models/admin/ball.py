@@ -1,16 +1,19 @@
+from collections import defaultdict
 from typing import TYPE_CHECKING, Any
 
-import json
-
 from django import forms
 from django.contrib import admin
 from django.contrib.admin.utils import quote
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, pre_delete
 from django.forms import Textarea
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.text import capfirst
 
+from ballsdex.core.battle import validate_capacity_logic
+
 from ..models import Ball, BallInstance, Economy, Regime, TradeObject, transform_media
 
 
@@ -24,26 +27,10 @@ class BallForm(forms.ModelForm):
         # allow empty
         if not data:
             return {}
-        # ensure it's a dict
-        if not isinstance(data, dict):
-            raise forms.ValidationError("capacity_logic must be a JSON object")
-
-        allowed_hooks = {"on_enter", "on_attack", "on_defend", "on_exit"}
-        allowed_types = {"damage_multiplier", "extra_damage", "heal", "shield"}
-
-        for hook, entries in data.items():
-            if hook not in allowed_hooks:
-                raise forms.ValidationError(f"Unknown hook '{hook}' in capacity_logic")
-            if not isinstance(entries, list):
-                raise forms.ValidationError(f"Hook '{hook}' must contain a list of ability entries")
-            for entry in entries:
-                if not isinstance(entry, dict):
-                    raise forms.ValidationError("Each ability entry must be an object")
-                t = entry.get("type")
-                if t not in allowed_types:
-                    raise forms.ValidationError(f"Unknown ability type '{t}'")
-                if "value" not in entry:
-                    raise forms.ValidationError("Each ability entry must include a 'value' field")
+        try:
+            validate_capacity_logic(data)
+        except ValueError as e:
+            raise forms.ValidationError(str(e)) from e
 
         return data
 
@@ -72,21 +59,29 @@ class RegimeAdmin(admin.ModelAdmin):
             "trade objects": TradeObject.objects.filter(ballinstance__ball__regime_id__in=regime_ids).count(),
         }
 
+        # resolve each change URL once per model, then only interpolate the primary key
+        url_templates: dict[type["Model"], str] = {}
+
         def format_callback(obj: "Model"):
             opts = obj._meta
-            admin_url = reverse(
-                "%s:%s_%s_change" % (self.admin_site.name, opts.app_label, opts.model_name), None, (quote(obj.pk),)
-            )
+            url_template = url_templates.get(type(obj))
+            if url_template is None:
+                url_template = reverse(
+                    "%s:%s_%s_change" % (self.admin_site.name, opts.app_label, opts.model_name), None, ("__pk__",)
+                ).replace("__pk__", "{}")
+                url_templates[type(obj)] = url_template
+            admin_url = url_template.format(quote(obj.pk))
             # Display a link to the admin page.
             return format_html('{}: <a href="{}">{}</a>', capfirst(opts.verbose_name), admin_url, obj)
 
+        balls_by_regime: defaultdict[int, list[Ball]] = defaultdict(list)
+        for ball in Ball.objects.filter(regime_id__in=regime_ids).only("pk", "country", "regime_id"):
+            balls_by_regime[ball.regime_id].append(ball)
+
         text = []
         for regime in objs:
-            subtext = []
-            for ball in Ball.objects.filter(regime=regime):
-                subtext.append(format_callback(ball))
             text.append(format_callback(regime))
-            text.append(subtext)
+            text.append([format_callback(ball) for ball in balls_by_regime[regime.pk]])
 
         return (
             [
@@ -166,11 +161,33 @@ class BallAdmin(admin.ModelAdmin):
         self, objs: "QuerySet[Ball]", request: "HttpRequest"
     ) -> tuple[list[str], dict[str, int], set[Any], list[Any]]:
         instances = BallInstance.objects.filter(ball_id__in=set(x.pk for x in objs))
-        if len(instances) < 500:
+        instance_count = instances.count()
+        if instance_count < 500:
             return super().get_deleted_objects(objs, request)  # type: ignore
         model_count = {
             "balls": len(objs),
-            "ball instances": len(instances),
-            "trade objects": TradeObject.objects.filter(ballinstance_id__in=instances).count(),
+            "ball instances": instance_count,
+            "trade objects": TradeObject.objects.filter(
+                ballinstance_id__in=instances.values_list("pk", flat=True)
+            ).count(),
         }
         return ["Too long to display"], model_count, set(), []
+
+    def delete_queryset(self, request: "HttpRequest", queryset: "QuerySet[Ball]") -> None:
+        # Django's collector loads every cascaded instance and trade object in memory before deleting.
+        # When nothing listens to their deletion, clear them with plain DELETE statements instead.
+        signals = (pre_delete, post_delete)
+        if any(signal.has_listeners(model) for signal in signals for model in (BallInstance, TradeObject)):
+            return super().delete_queryset(request, queryset)
+
+        ball_ids = list(queryset.values_list("pk", flat=True))
+        instance_table = BallInstance._meta.db_table
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {TradeObject._meta.db_table} WHERE ballinstance_id IN "
+                    f"(SELECT id FROM {instance_table} WHERE ball_id = ANY(%s))",
+                    [ball_ids],
+                )
+                cursor.execute(f"DELETE FROM {instance_table} WHERE ball_id = ANY(%s)", [ball_ids])
+            queryset.delete()
@@ -1,63 +1,195 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
-
-from admin_panel.bd_models.models import BallInstance
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from cachetools import LRUCache
+
+if TYPE_CHECKING:
+	from admin_panel.bd_models.models import BallInstance
+
+ALLOWED_HOOKS = frozenset({"on_enter", "on_attack", "on_defend", "on_exit"})
+ALLOWED_TYPES = frozenset({"damage_multiplier", "extra_damage", "heal", "shield"})
+
+
+def validate_capacity_logic(data: Any) -> None:
+	"""
+	Check the shape of a ball's capacity_logic, shared by the admin form and the battle engine.
+	Raises `ValueError` with a user-facing message on invalid data.
+	"""
+	if not isinstance(data, dict):
+		raise ValueError("capacity_logic must be a JSON object")
+	for hook, entries in data.items():
+		if hook not in ALLOWED_HOOKS:
+			raise ValueError(f"Unknown hook '{hook}' in capacity_logic")
+		if not isinstance(entries, list):
+			raise ValueError(f"Hook '{hook}' must contain a list of ability entries")
+		for entry in entries:
+			if not isinstance(entry, dict):
+				raise ValueError("Each ability entry must be an object")
+			t = entry.get("type")
+			if t not in ALLOWED_TYPES:
+				raise ValueError(f"Unknown ability type '{t}'")
+			if "value" not in entry:
+				raise ValueError("Each ability entry must include a 'value' field")
 
 
-@dataclass
+@dataclass(slots=True)
 class Participant:
 	instance: BallInstance
 	max_hp: int
 	current_hp: int
+	attack: int
+	desc: str
 	shield_percent: float = 0.0
 	extra_damage_multiplier: float = 1.0
 	extra_flat_damage: int = 0
+	has_logic: bool = False
+	_compiled_logic: Dict[str, List[Tuple[int, Any, str]]] = field(default_factory=dict)
+
+
+# ability type codes, used to dispatch compiled capacity_logic entries
+DAMAGE_MULTIPLIER = 0
+EXTRA_DAMAGE = 1
+HEAL = 2
+SHIELD = 3
+UNKNOWN = -1
+
+ABILITY_CODES: Dict[str, int] = {
+	"damage_multiplier": DAMAGE_MULTIPLIER,
+	"extra_damage": EXTRA_DAMAGE,
+	"heal": HEAL,
+	"shield": SHIELD,
+}
 
 
 class AbilityProcessor:
 	@staticmethod
-	def apply_abilities(when: str, actor: Participant, target: Optional[Participant]) -> List[str]:
+	def compile_logic(logic: Optional[Dict[str, Any]], max_hp: int) -> Dict[str, List[Tuple[int, Any, str]]]:
+		"""
+		Turn a ball's capacity_logic into a mapping of hook -> list of (type_code, value, text).
+		Values are coerced once here so that applying abilities does no parsing. Heals are
+		resolved to an HP amount from `max_hp`, and `text` holds the constant part of the log
+		message. Unknown ability types are kept with the UNKNOWN code and their full message.
+		Keys other than the battle hooks are ignored, the engine never reads them.
+		"""
+		compiled: Dict[str, List[Tuple[int, Any, str]]] = {}
+		for when in ALLOWED_HOOKS:
+			entries = logic.get(when) if logic else None
+			if not entries:
+				continue
+			ops: List[Tuple[int, Any, str]] = []
+			for entry in entries:
+				t = entry.get("type")
+				code = ABILITY_CODES.get(t, UNKNOWN)
+				if code == DAMAGE_MULTIPLIER:
+					mult = float(entry.get("value", 1.0))
+					ops.append((code, mult, f"uses damage x{mult}."))
+				elif code == EXTRA_DAMAGE:
+					amt = int(entry.get("value", 0))
+					ops.append((code, amt, f"gains +{amt} extra damage this attack."))
+				elif code == HEAL:
+					heal = max(1, int(max_hp * float(entry.get("value", 0.0))))
+					ops.append((code, heal, f"heals {heal} HP."))
+				elif code == SHIELD:
+					pct = float(entry.get("value", 0.0))
+					ops.append((code, pct, f"grants a {int(pct*100)}% shield to"))
+				else:
+					ops.append((code, t, f"Unknown ability type: {t}"))
+			compiled[when] = ops
+		return compiled
+
+	@staticmethod
+	def apply_abilities(
+		when: str, actor: Participant, target: Optional[Participant], logs: List[str], verbose: bool = True
+	) -> None:
 		"""
-		Apply abilities defined in the actor's ball.capacity_logic.
+		Apply abilities defined in the actor's ball.capacity_logic, appending messages to `logs`.
 		Expected structure: {"on_enter":[], "on_attack": [], "on_defend": [], "on_exit": []}
 		Supported ability types: damage_multiplier, extra_damage, heal, shield
+		Messages are only built when `verbose` is true.
 		"""
-		logs: List[str] = []
-		logic: Dict[str, Any] = actor.instance.countryball.capacity_logic or {}
-		for entry in logic.get(when, []):
-			t = entry.get("type")
-			if t == "damage_multiplier":
-				mult = float(entry.get("value", 1.0))
-				logs.append(f"{actor.instance.short_description()} uses damage x{mult}.")
-				actor.extra_damage_multiplier *= mult
-			elif t == "extra_damage":
-				amt = int(entry.get("value", 0))
-				logs.append(f"{actor.instance.short_description()} gains +{amt} extra damage this attack.")
-				actor.extra_flat_damage += amt
-			elif t == "heal":
-				pct = float(entry.get("value", 0.0))
-				heal = max(1, int(actor.max_hp * pct))
-				actor.current_hp = min(actor.current_hp + heal, actor.max_hp)
-				logs.append(f"{actor.instance.short_description()} heals {heal} HP.")
-			elif t == "shield":
-				pct = float(entry.get("value", 0.0))
+		for code, value, text in actor._compiled_logic.get(when, ()):
+			if code == DAMAGE_MULTIPLIER:
+				actor.extra_damage_multiplier *= value
+			elif code == EXTRA_DAMAGE:
+				actor.extra_flat_damage += value
+			elif code == HEAL:
+				actor.current_hp = min(actor.current_hp + value, actor.max_hp)
+			elif code == SHIELD:
 				if target:
-					target.shield_percent = max(target.shield_percent, pct)
-					logs.append(
-						f"{actor.instance.short_description()} grants a {int(pct*100)}% shield to {target.instance.short_description()}."
-					)
+					target.shield_percent = max(target.shield_percent, value)
+					if verbose:
+						logs.append(f"{actor.desc} {text} {target.desc}.")
+				continue
 			else:
-				logs.append(f"Unknown ability type: {t}")
+				if verbose:
+					logs.append(text)
+				continue
+			if verbose:
+				logs.append(f"{actor.desc} {text}")
 
-		return logs
+
+def simulate_stats(
+	attacks_a: List[int], hps_a: List[int], attacks_b: List[int], hps_b: List[int], max_turns: int = 1000
+) -> bool:
+	"""
+	Numeric core of a battle between participants without abilities.
+
+	Only plain ints and lists are touched so the loop stays cheap. `hps_a` and `hps_b` are
+	updated in place and the return value tells whether the turn limit was reached.
+	"""
+	na = len(hps_a)
+	nb = len(hps_b)
+	ia = 0
+	while ia < na and hps_a[ia] <= 0:
+		ia += 1
+	ib = 0
+	while ib < nb and hps_b[ib] <= 0:
+		ib += 1
+
+	turn = 1
+	while ia < na and ib < nb:
+		hps_b[ib] -= max(1, attacks_a[ia])
+		while ib < nb and hps_b[ib] <= 0:
+			ib += 1
+		if ib >= nb:
+			break
+
+		hps_a[ia] -= max(1, attacks_b[ib])
+		while ia < na and hps_a[ia] <= 0:
+			ia += 1
+
+		turn += 1
+		if turn > max_turns:
+			return True
+	return False
+
+
+# indexed by (a_alive << 1) | b_alive
+_WINNERS = ("draw", "B", "A", "draw")
+
+
+def _winner(a_alive: bool, b_alive: bool) -> str:
+	return _WINNERS[(a_alive << 1) | b_alive]
+
+
+_OUTCOME_LINES = {"A": "Team A wins!", "B": "Team B wins!", "draw": "Battle ended in a draw."}
+
+# outcomes of previously simulated matchups, see TeamBattle.simulate_matchup
+_matchup_cache: LRUCache[Tuple[Any, Any], str] = LRUCache(maxsize=10000)
 
 
 class TeamBattle:
-	"""Simulate a battle between two teams (lists) of up to 3 BallInstances each."""
+	"""
+	Simulate a battle between two teams (lists) of up to 3 BallInstances each.
+
+	With `verbose=False`, only the final outcome line is logged, which is much cheaper
+	when the battle is simulated in bulk and the turn-by-turn log is not needed.
+	"""
 
-	def __init__(self, team_a: List[BallInstance], team_b: List[BallInstance]):
+	def __init__(self, team_a: List[BallInstance], team_b: List[BallInstance], verbose: bool = True):
 		if not team_a or not team_b:
 			raise ValueError("Both teams must have at least one BallInstance")
 
@@ -65,105 +197,195 @@ class TeamBattle:
 			parts: List[Participant] = []
 			for inst in team[:3]:
 				maxhp = inst.health
-				parts.append(Participant(instance=inst, max_hp=maxhp, current_hp=maxhp))
+				capacity_logic = inst.countryball.capacity_logic
+				if capacity_logic:
+					try:
+						validate_capacity_logic(capacity_logic)
+					except ValueError:
+						# only saving through the admin form validates it, invalid logic is left out of the battle
+						capacity_logic = None
+				logic = AbilityProcessor.compile_logic(capacity_logic, maxhp)
+				parts.append(
+					Participant(
+						instance=inst,
+						max_hp=maxhp,
+						current_hp=maxhp,
+						attack=inst.attack,
+						desc=inst.short_description(),
+						has_logic=any(logic.values()),
+						_compiled_logic=logic,
+					)
+				)
 			return parts
 
 		self.team_a = make_participants(team_a)
 		self.team_b = make_participants(team_b)
+		# index of the currently active participant of each team
+		self._a_idx = self._b_idx = 0
+		self._v = verbose
+		# "A", "B" or "draw", set once the battle has run
+		self.winner: Optional[str] = None
 
-	def _active(self, team: List[Participant]) -> Optional[Participant]:
-		for p in team:
-			if p.current_hp > 0:
-				return p
-		return None
+	@staticmethod
+	def _skip_fainted(team: List[Participant], idx: int) -> int:
+		# only the active participant can lose HP, so everything before the cursor stays fainted
+		while idx < len(team) and team[idx].current_hp <= 0:
+			idx += 1
+		return idx
+
+	def _attack(
+		self, attacker: Participant, defender_team: List[Participant], defender_idx: int, logs: List[str]
+	) -> int:
+		"""
+		Resolve one attack against the active defender, returning the defender team's new cursor.
+		"""
+		v = self._v
+		defender = defender_team[defender_idx]
+		if attacker.has_logic:
+			AbilityProcessor.apply_abilities("on_attack", attacker, defender, logs, v)
+		dmg = int(attacker.attack * attacker.extra_damage_multiplier) + attacker.extra_flat_damage
+		if defender.has_logic:
+			AbilityProcessor.apply_abilities("on_defend", defender, attacker, logs, v)
+
+		if defender.shield_percent:
+			reduction = int(dmg * defender.shield_percent)
+			dmg -= reduction
+			if v:
+				logs.append(f"{defender.desc} absorbs {reduction} damage with shield.")
+
+		dmg = max(1, dmg)
+		defender.current_hp -= dmg
+		if v:
+			logs.append(f"{attacker.desc} deals {dmg} damage. {defender.desc} HP is now {max(defender.current_hp,0)}.")
+
+		attacker.extra_damage_multiplier = 1.0
+		attacker.extra_flat_damage = 0
+
+		if defender.current_hp <= 0:
+			if v:
+				logs.append(f"{defender.desc} has been defeated.")
+			if defender.has_logic:
+				AbilityProcessor.apply_abilities("on_exit", defender, attacker, logs, v)
+			defender_idx = self._skip_fainted(defender_team, defender_idx)
+			if defender_idx < len(defender_team) and defender_team[defender_idx].has_logic:
+				AbilityProcessor.apply_abilities("on_enter", defender_team[defender_idx], attacker, logs, v)
+		return defender_idx
 
 	def run(self) -> List[str]:
 		logs: List[str] = []
+		v = self._v
 		turn = 1
+		team_a = self.team_a
+		team_b = self.team_b
+		self._a_idx = self._skip_fainted(team_a, self._a_idx)
+		self._b_idx = self._skip_fainted(team_b, self._b_idx)
 
-		# trigger on_enter for initial participants
-		a_active = self._active(self.team_a)
-		b_active = self._active(self.team_b)
-		if a_active:
-			logs += AbilityProcessor.apply_abilities("on_enter", a_active, b_active)
-		if b_active:
-			logs += AbilityProcessor.apply_abilities("on_enter", b_active, a_active)
-
-		while True:
-			a_active = self._active(self.team_a)
-			b_active = self._active(self.team_b)
-			if not a_active or not b_active:
-				break
-
-			logs.append(f"-- Turn {turn}: {a_active.instance.short_description()} vs {b_active.instance.short_description()} --")
-
-			# team A attacks
-			logs += AbilityProcessor.apply_abilities("on_attack", a_active, b_active)
-			dmg = int(a_active.instance.attack * a_active.extra_damage_multiplier) + a_active.extra_flat_damage
-			logs += AbilityProcessor.apply_abilities("on_defend", b_active, a_active)
+		if not v and not any(p.has_logic for p in (*team_a, *team_b)):
+			return self._run_stats()
 
-			if b_active.shield_percent:
-				reduction = int(dmg * b_active.shield_percent)
-				dmg -= reduction
-				logs.append(f"{b_active.instance.short_description()} absorbs {reduction} damage with shield.")
-
-			dmg = max(1, dmg)
-			b_active.current_hp -= dmg
-			logs.append(f"{a_active.instance.short_description()} deals {dmg} damage. {b_active.instance.short_description()} HP is now {max(b_active.current_hp,0)}.")
-
-			a_active.extra_damage_multiplier = 1.0
-			a_active.extra_flat_damage = 0
-
-			if b_active.current_hp <= 0:
-				logs.append(f"{b_active.instance.short_description()} has been defeated.")
-				logs += AbilityProcessor.apply_abilities("on_exit", b_active, a_active)
-				next_def = self._active(self.team_b)
-				if next_def:
-					logs += AbilityProcessor.apply_abilities("on_enter", next_def, a_active)
+		# trigger on_enter for initial participants
+		a_active = team_a[self._a_idx] if self._a_idx < len(team_a) else None
+		b_active = team_b[self._b_idx] if self._b_idx < len(team_b) else None
+		if a_active and a_active.has_logic:
+			AbilityProcessor.apply_abilities("on_enter", a_active, b_active, logs, v)
+		if b_active and b_active.has_logic:
+			AbilityProcessor.apply_abilities("on_enter", b_active, a_active, logs, v)
+
+		a_idx, b_idx = self._a_idx, self._b_idx
+		na, nb = len(team_a), len(team_b)
+		while a_idx < na and b_idx < nb:
+			a_active = team_a[a_idx]
+			b_active = team_b[b_idx]
+			if v:
+				logs.append(f"-- Turn {turn}: {a_active.desc} vs {b_active.desc} --")
+
+			# team A attacks, only the defender of team B may have changed afterwards
+			next_b = self._attack(a_active, team_b, b_idx, logs)
+			if next_b != b_idx:
+				b_idx = next_b
+				if b_idx >= nb:
+					break
+				b_active = team_b[b_idx]
+
+			# team B attacks
+			a_idx = self._attack(b_active, team_a, a_idx, logs)
 
-			# team B attacks (if still alive)
-			a_active = self._active(self.team_a)
-			b_active = self._active(self.team_b)
-			if not a_active or not b_active:
+			turn += 1
+			if turn > 1000:
+				if v:
+					logs.append("Turn limit reached, ending in a draw.")
 				break
+		self._a_idx, self._b_idx = a_idx, b_idx
 
-			logs += AbilityProcessor.apply_abilities("on_attack", b_active, a_active)
-			dmg = int(b_active.instance.attack * b_active.extra_damage_multiplier) + b_active.extra_flat_damage
-			logs += AbilityProcessor.apply_abilities("on_defend", a_active, b_active)
-
-			if a_active.shield_percent:
-				reduction = int(dmg * a_active.shield_percent)
-				dmg -= reduction
-				logs.append(f"{a_active.instance.short_description()} absorbs {reduction} damage with shield.")
-
-			dmg = max(1, dmg)
-			a_active.current_hp -= dmg
-			logs.append(f"{b_active.instance.short_description()} deals {dmg} damage. {a_active.instance.short_description()} HP is now {max(a_active.current_hp,0)}.")
-
-			b_active.extra_damage_multiplier = 1.0
-			b_active.extra_flat_damage = 0
+		self._log_outcome(logs)
+		return logs
 
-			if a_active.current_hp <= 0:
-				logs.append(f"{a_active.instance.short_description()} has been defeated.")
-				logs += AbilityProcessor.apply_abilities("on_exit", a_active, b_active)
-				next_a = self._active(self.team_a)
-				if next_a:
-					logs += AbilityProcessor.apply_abilities("on_enter", next_a, b_active)
+	@classmethod
+	def simulate_many(
+		cls,
+		hps_a: Sequence[Sequence[int]],
+		atks_a: Sequence[Sequence[int]],
+		hps_b: Sequence[Sequence[int]],
+		atks_b: Sequence[Sequence[int]],
+	) -> List[str]:
+		"""
+		Simulate many ability-less battles from raw stats, one row of up to 3 values per battle.
+		Returns the winner of each battle: "A", "B" or "draw".
+		"""
+		if not (len(hps_a) == len(atks_a) == len(hps_b) == len(atks_b)):
+			raise ValueError("All stat sequences must describe the same number of battles")
+
+		results: List[str] = []
+		for row_hp_a, row_atk_a, row_hp_b, row_atk_b in zip(hps_a, atks_a, hps_b, atks_b):
+			cur_a = list(row_hp_a[:3])
+			cur_b = list(row_hp_b[:3])
+			simulate_stats(list(row_atk_a[:3]), cur_a, list(row_atk_b[:3]), cur_b)
+			results.append(_winner(any(hp > 0 for hp in cur_a), any(hp > 0 for hp in cur_b)))
+		return results
+
+	@classmethod
+	def simulate_matchup(cls, team_a: List[BallInstance], team_b: List[BallInstance]) -> str:
+		"""
+		Return the winner ("A", "B" or "draw") of a battle between two teams, without logs.
 
-			turn += 1
-			if turn > 1000:
-				logs.append("Turn limit reached, ending in a draw.")
-				break
+		Battles are deterministic, so the outcome is memoized by the stats and capacity_logic
+		of each participant. Replaying the same matchup (tournaments, balancing) is then a lookup.
+		"""
+		key = (cls._matchup_key(team_a), cls._matchup_key(team_b))
+		winner = _matchup_cache.get(key)
+		if winner is None:
+			battle = cls(team_a, team_b, verbose=False)
+			battle.run()
+			# run always records the winner
+			assert battle.winner is not None
+			winner = _matchup_cache[key] = battle.winner
+		return winner
 
-		a_alive = any(p.current_hp > 0 for p in self.team_a)
-		b_alive = any(p.current_hp > 0 for p in self.team_b)
-		if a_alive and not b_alive:
-			logs.append("Team A wins!")
-		elif b_alive and not a_alive:
-			logs.append("Team B wins!")
-		else:
-			logs.append("Battle ended in a draw.")
+	@staticmethod
+	def _matchup_key(team: List[BallInstance]) -> Tuple[Tuple[int, int, str], ...]:
+		return tuple(
+			(inst.health, inst.attack, json.dumps(inst.countryball.capacity_logic or {}, sort_keys=True))
+			for inst in team[:3]
+		)
+
+	def _run_stats(self) -> List[str]:
+		hps_a = [p.current_hp for p in self.team_a]
+		hps_b = [p.current_hp for p in self.team_b]
+		simulate_stats([p.attack for p in self.team_a], hps_a, [p.attack for p in self.team_b], hps_b)
+		for p, hp in zip(self.team_a, hps_a):
+			p.current_hp = hp
+		for p, hp in zip(self.team_b, hps_b):
+			p.current_hp = hp
+		self._a_idx = self._skip_fainted(self.team_a, self._a_idx)
+		self._b_idx = self._skip_fainted(self.team_b, self._b_idx)
 
+		logs: List[str] = []
+		self._log_outcome(logs)
 		return logs
 
+	def _log_outcome(self, logs: List[str]) -> None:
+		# the cursors stop on the first participant still standing, a team past its end has none left
+		self.winner = _winner(self._a_idx < len(self.team_a), self._b_idx < len(self.team_b))
+		logs.append(_OUTCOME_LINES[self.winner])
+
 
@@ -144,20 +144,24 @@ class Core(commands.GroupCog):
         The emoji IDs of the countryballs are updated afterwards.
         This does not delete guild emojis after they were migrated.
         """
-        balls = Ball.objects.all()
-        if not await balls.aexists():
+        balls = [x async for x in Ball.objects.all()]
+        if not balls:
             await ctx.send(f"No {settings.plural_collectible_name} found.")
             return
 
-        application_emojis = set(x.name for x in await self.bot.fetch_application_emojis())
+        fetched_application_emojis = await self.bot.fetch_application_emojis()
+        application_emojis = set(x.name for x in fetched_application_emojis)
+        # resolve emojis from one dict, application emojis taking precedence like BallsDexBot.get_emoji
+        emoji_by_id = {x.id: x for x in self.bot.emojis}
+        emoji_by_id.update((x.id, x) for x in fetched_application_emojis)
 
         not_found: set[Ball] = set()
         already_uploaded: list[tuple[Ball, discord.Emoji]] = []
         matching_name: list[tuple[Ball, discord.Emoji]] = []
         to_upload: list[tuple[Ball, discord.Emoji]] = []
 
-        async for ball in balls:
-            emote = self.bot.get_emoji(ball.emoji_id)
+        for ball in balls:
+            emote = emoji_by_id.get(ball.emoji_id)
             if not emote:
                 not_found.add(ball)
             elif emote.is_application_owned():
@@ -205,24 +209,50 @@ class Core(commands.GroupCog):
             return
 
         uploaded = 0
+        done = asyncio.Event()
 
         async def update_message_loop():
-            for i in range(5 * 12 * 10):  # timeout progress after 10 minutes
-                print(f"Updating msg {uploaded}")
-                await msg.edit(content=f"Uploading emojis... ({uploaded}/{len(to_upload)})", view=None)
-                await asyncio.sleep(5)
+            # only edit the message when progress changed, at most every 5 seconds
+            last_reported = -1
+            while not done.is_set():
+                if uploaded != last_reported:
+                    last_reported = uploaded
+                    await msg.edit(content=f"Uploading emojis... ({uploaded}/{len(to_upload)})", view=None)
+                try:
+                    await asyncio.wait_for(done.wait(), timeout=5)
+                except TimeoutError:
+                    pass
+
+        # discord.py handles rate limits, the semaphore only bounds how many uploads are in flight
+        semaphore = asyncio.Semaphore(5)
+        migrated: list[Ball] = []
+
+        async def upload(ball: Ball, emote: discord.Emoji):
+            nonlocal uploaded
+            async with semaphore:
+                new_emote = await self.bot.create_application_emoji(name=emote.name, image=await emote.read())
+                ball.emoji_id = new_emote.id
+                migrated.append(ball)
+                uploaded += 1
+                print(f"Uploaded {ball}")
 
         task = self.bot.loop.create_task(update_message_loop())
         try:
             async with ctx.typing():
-                for ball, emote in to_upload:
-                    new_emote = await self.bot.create_application_emoji(name=emote.name, image=await emote.read())
-                    ball.emoji_id = new_emote.id
-                    await ball.asave()
-                    uploaded += 1
-                    print(f"Uploaded {ball}")
-                    await asyncio.sleep(1)
+                try:
+                    # a failed upload doesn't stop the others, every emoji still in flight gets created
+                    results = await asyncio.gather(
+                        *(upload(ball, emote) for ball, emote in to_upload), return_exceptions=True
+                    )
+                finally:
+                    done.set()
+                # all uploads have stopped, save what was uploaded even if some failed, those emojis exist now
+                if migrated:
+                    await Ball.objects.abulk_update(migrated, ["emoji_id"])
                 await self.bot.load_cache()
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
             task.cancel()
             assert self.bot.application
             await ctx.send(
@@ -241,10 +271,11 @@ class Core(commands.GroupCog):
         handler = cast("DequeHandler | None", logging.getHandlerByName("buffer"))
         assert handler is not None
 
-        text = "\n".join(handler.format(record) for record in handler.deque)
+        lines = handler.lines()
+        text = "\n".join(lines)
         text_display = discord.ui.TextDisplay("")
         view = LayoutView()
-        view.add_item(discord.ui.TextDisplay(f"Last {len(handler.deque)} log entries"))
+        view.add_item(discord.ui.TextDisplay(f"Last {len(lines)} log entries"))
         view.add_item(text_display)
         menu = Menu(self.bot, view, TextSource(text, prefix="```ansi\n", suffix="```"), TextFormatter(text_display))
         await menu.init()
@@ -1,4 +1,8 @@
-from ballsdex.core.battle import TeamBattle, AbilityProcessor
+import random
+
+import pytest
+
+from ballsdex.core.battle import EXTRA_DAMAGE, HEAL, UNKNOWN, AbilityProcessor, TeamBattle, validate_capacity_logic
 
 
 class _MockBall:
@@ -38,6 +42,18 @@ def test_simple_1v1_damage():
     assert any("wins" in line.lower() for line in logs)
 
 
+def test_winner_is_recorded():
+    strong = _MockInstance(_MockBall(health=20, attack=5))
+    weak = _MockInstance(_MockBall(health=10, attack=1), pk=2)
+    tb = TeamBattle([weak], [strong])
+    assert tb.winner is None
+    assert tb.run()[-1] == "Team B wins!"
+    assert tb.winner == "B"
+    quiet = TeamBattle([strong], [weak], verbose=False)
+    quiet.run()
+    assert quiet.winner == "A"
+
+
 def test_ability_extra_damage_and_shield():
     a_ball = _MockBall(health=20, attack=5, capacity_logic={"on_attack": [{"type": "extra_damage", "value": 3}]})
     b_ball = _MockBall(health=30, attack=4, capacity_logic={"on_defend": [{"type": "shield", "value": 0.5}]})
@@ -51,7 +67,14 @@ def test_ability_extra_damage_and_shield():
 
 
 def test_heal_and_multiplier():
-    a_ball = _MockBall(health=10, attack=4, capacity_logic={"on_attack": [{"type": "damage_multiplier", "value": 2.0}], "on_enter": [{"type": "heal", "value": 0.5}]})
+    a_ball = _MockBall(
+        health=10,
+        attack=4,
+        capacity_logic={
+            "on_attack": [{"type": "damage_multiplier", "value": 2.0}],
+            "on_enter": [{"type": "heal", "value": 0.5}],
+        },
+    )
     b_ball = _MockBall(health=30, attack=2)
     a = _MockInstance(a_ball, pk=50)
     b = _MockInstance(b_ball, pk=60)
@@ -59,4 +82,92 @@ def test_heal_and_multiplier():
     logs = tb.run()
     assert any("heals" in line.lower() for line in logs)
     assert any("uses damage x" in line.lower() for line in logs)
-*** End Patch
\ No newline at end of file
+
+
+def test_compile_logic_coerces_values():
+    compiled = AbilityProcessor.compile_logic(
+        {
+            "on_attack": [{"type": "extra_damage", "value": "3"}, {"type": "bogus", "value": 1}],
+            "on_enter": [{"type": "heal", "value": 0.25}],
+            "notes": "not a hook",
+        },
+        max_hp=10,
+    )
+    assert compiled.keys() == {"on_attack", "on_enter"}
+    assert compiled["on_attack"] == [
+        (EXTRA_DAMAGE, 3, "gains +3 extra damage this attack."),
+        (UNKNOWN, "bogus", "Unknown ability type: bogus"),
+    ]
+    assert compiled["on_enter"] == [(HEAL, 2, "heals 2 HP.")]
+    assert AbilityProcessor.compile_logic(None, max_hp=10) == {}
+
+
+def test_next_participant_enters_after_defeat():
+    a = _MockInstance(_MockBall(health=50, attack=10), pk=1)
+    b1 = _MockInstance(_MockBall(health=5, attack=1), pk=2)
+    b2_ball = _MockBall(health=5, attack=1, capacity_logic={"on_enter": [{"type": "heal", "value": 0.5}]})
+    b2 = _MockInstance(b2_ball, pk=3)
+    tb = TeamBattle([a], [b1, b2])
+    logs = tb.run()
+    assert "#3 Mock heals 2 HP." in logs
+    assert logs[-1] == "Team A wins!"
+
+
+def test_quiet_battle_only_logs_outcome():
+    a_ball = _MockBall(health=20, attack=5, capacity_logic={"on_attack": [{"type": "extra_damage", "value": 3}]})
+    a = _MockInstance(a_ball, pk=1)
+    b = _MockInstance(_MockBall(health=30, attack=4), pk=2)
+    verbose = TeamBattle([a], [b]).run()
+    quiet = TeamBattle([a], [b], verbose=False).run()
+    assert quiet == [verbose[-1]]
+
+
+def test_stats_kernel_matches_full_simulation():
+    rng = random.Random(42)
+    for _ in range(200):
+        team_a = [
+            _MockInstance(_MockBall(rng.randint(1, 60), rng.randint(0, 15)), pk=i) for i in range(rng.randint(1, 3))
+        ]
+        team_b = [
+            _MockInstance(_MockBall(rng.randint(1, 60), rng.randint(0, 15)), pk=i) for i in range(rng.randint(1, 3))
+        ]
+        full = TeamBattle(team_a, team_b)
+        quiet = TeamBattle(team_a, team_b, verbose=False)
+        assert full.run()[-1] == quiet.run()[-1]
+        assert [p.current_hp for p in full.team_a] == [p.current_hp for p in quiet.team_a]
+        assert [p.current_hp for p in full.team_b] == [p.current_hp for p in quiet.team_b]
+
+
+def test_simulate_many():
+    results = TeamBattle.simulate_many(
+        [[20], [5, 5], [1500]], [[5], [1, 1], [0]], [[10], [50], [1500]], [[1], [10], [0]]
+    )
+    assert results == ["A", "B", "draw"]
+
+
+def test_validate_capacity_logic():
+    validate_capacity_logic({"on_attack": [{"type": "heal", "value": 0.2}]})
+    with pytest.raises(ValueError, match="Unknown hook"):
+        validate_capacity_logic({"on_sleep": []})
+    with pytest.raises(ValueError, match="Unknown ability type"):
+        validate_capacity_logic({"on_attack": [{"type": "bogus", "value": 1}]})
+    with pytest.raises(ValueError, match="'value' field"):
+        validate_capacity_logic({"on_attack": [{"type": "heal"}]})
+
+
+def test_invalid_logic_is_left_out_of_battles():
+    a = _MockInstance(_MockBall(health=20, attack=5, capacity_logic={"on_attack": [{"type": "heal"}], "notes": "x"}))
+    b = _MockInstance(_MockBall(health=10, attack=1), pk=2)
+    tb = TeamBattle([a], [b])
+    assert not tb.team_a[0].has_logic
+    assert tb.run()[-1] == "Team A wins!"
+
+
+def test_simulate_matchup_is_memoized():
+    a = _MockInstance(_MockBall(health=20, attack=5, capacity_logic={"on_enter": [{"type": "heal", "value": 0.5}]}))
+    b = _MockInstance(_MockBall(health=10, attack=1))
+    assert TeamBattle.simulate_matchup([a], [b]) == "A"
+    # changed stats must not reuse the previous outcome
+    a._ball.attack = 0
+    b._ball.attack = 50
+    assert TeamBattle.simulate_matchup([a], [b]) == "B"
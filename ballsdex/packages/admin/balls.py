@@ -1,17 +1,23 @@
+import array
 import asyncio
 import io
 import logging
+import os
 import random
-import re
+import secrets
 import time
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Sequence, cast
 
 import discord
 from asgiref.sync import sync_to_async
+from cachetools import TTLCache
 from discord import app_commands
 from discord.ext import commands
 from discord.utils import format_dt
+from django.db import transaction
 from django.urls import reverse
 
 from ballsdex.core.bot import BallsDexBot
@@ -29,37 +35,183 @@ if TYPE_CHECKING:
     from ballsdex.packages.countryballs.countryball import BallSpawnView
 
 log = logging.getLogger("ballsdex.packages.admin.balls")
-FILENAME_RE = re.compile(r"^(.+)(\.\S+)$")
 
-# in-memory battle sessions: session_id -> dict
-_battle_sessions: dict[str, dict] = {}
+@dataclass(slots=True)
+class BattleSession:
+    """
+    A battle being prepared between two players, until both of them confirm their team.
 
+    Attributes
+    ----------
+    host: int
+        Discord ID of the player who started the session, their countryballs form team A
+    opponent: int
+        Discord ID of the challenged player, their countryballs form team B
+    limit: int
+        Maximum number of countryballs per team
+    channel: discord.abc.Messageable
+        Where the session was started, the results are sent there
+    team_a: array.array[int]
+        Instance IDs of the host's team, in the order they were added
+    team_b: array.array[int]
+        Instance IDs of the opponent's team, in the order they were added
+    members: set[int]
+        Every instance ID of both teams, for duplicate checks
+    pending: dict[int, int]
+        Instance IDs whose ownership is being checked, mapped to the Discord ID of the player adding
+        them. They only join a team once verified, and confirming is refused meanwhile.
+    host_confirmed: bool
+        Whether the host confirmed their current team
+    opponent_confirmed: bool
+        Whether the opponent confirmed their current team
+    """
 
-def _new_session_id() -> str:
-    return hex(int(time.time() * 1000))[-8:]
+    host: int
+    opponent: int
+    limit: int
+    channel: "discord.abc.Messageable"
+    # packed unsigned 64-bit ids rather than lists of int objects
+    team_a: array.array[int] = field(default_factory=lambda: array.array("Q"))
+    team_b: array.array[int] = field(default_factory=lambda: array.array("Q"))
+    members: set[int] = field(default_factory=set)
+    pending: dict[int, int] = field(default_factory=dict)
+    host_confirmed: bool = False
+    opponent_confirmed: bool = False
+
+    def team_of(self, uid: int) -> array.array[int]:
+        return self.team_a if uid == self.host else self.team_b
 
+    def pending_count(self, uid: int) -> int:
+        return sum(1 for adder in self.pending.values() if adder == uid)
 
-async def _get_player(user: discord.User) -> "Player | None":
-    return await sync_to_async(Player.objects.filter(discord_id=user.id).first)()
+    def confirm(self, uid: int):
+        if uid == self.host:
+            self.host_confirmed = True
+        if uid == self.opponent:
+            self.opponent_confirmed = True
+
+    def reset_confirmations(self):
+        self.host_confirmed = self.opponent_confirmed = False
+
+
+# sessions that were never confirmed are dropped after this many seconds
+BATTLE_SESSION_TTL = 30 * 60
+# in-memory battle sessions: session_id -> BattleSession
+# bounded so that abandoned sessions cannot pile up, the least recently used one goes first when full
+_battle_sessions = TTLCache[str, BattleSession](maxsize=256, ttl=BATTLE_SESSION_TTL)
+
+
+async def sweep_battle_sessions(interval: float = 60):
+    """
+    Periodically drop expired battle sessions. The cache only expires entries when it is accessed,
+    this frees abandoned sessions even when no battle command is used for a while.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        _battle_sessions.expire()
+
+
+# finished battles waiting to be saved, written in batches by `flush_battle_records`
+_record_queue: asyncio.Queue[BattleRecord] = asyncio.Queue()
+RECORD_BATCH_SIZE = 64
+
+
+async def _write_records(batch: list[BattleRecord]):
+    try:
+        await BattleRecord.objects.abulk_create(batch)
+    except Exception:
+        log.exception(f"Failed to persist {len(batch)} BattleRecord(s)")
+
+
+async def flush_battle_records(interval: float = 5):
+    """
+    Save queued battle records, with one insert for every batch collected within `interval` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _record_queue.get()]
+        deadline = loop.time() + interval
+        try:
+            while len(batch) < RECORD_BATCH_SIZE:
+                batch.append(await asyncio.wait_for(_record_queue.get(), deadline - loop.time()))
+        except TimeoutError:
+            pass
+        finally:
+            # shielded so that cancelling the task on unload still saves what was collected
+            await asyncio.shield(_write_records(batch))
+
+
+async def drain_battle_records():
+    """
+    Save every record still queued, used when the flushing task is stopped.
+    """
+    batch: list[BattleRecord] = []
+    while not _record_queue.empty():
+        batch.append(_record_queue.get_nowait())
+    if batch:
+        await _write_records(batch)
+
+
+def _new_session_id() -> str:
+    session_id = secrets.token_hex(4)
+    while session_id in _battle_sessions:
+        session_id = secrets.token_hex(4)
+    return session_id
 
 
 async def _get_instance_display(instance_id: int) -> str:
     try:
-        inst = await sync_to_async(BallInstance.objects.get)(pk=instance_id)
+        inst = await BallInstance.objects.aget(pk=instance_id)
         return inst.short_description()
-    except Exception:
+    except BallInstance.DoesNotExist:
         return f"#{instance_id} (not found)"
 
 
+# largest primary key a BallInstance can have, the signed 64-bit range of a bigint column
+_MAX_BIGINT = 2**63 - 1
+
+# columns read by TeamBattle and BallInstance.short_description, the rest of the row is never used in battles
+_BATTLE_INSTANCE_FIELDS = ("id", "ball", "special", "health_bonus", "attack_bonus", "deleted", "locked", "favorite")
+
+
+async def _load_instances(ids: list[int]) -> dict[int, BallInstance]:
+    return await BallInstance.objects.select_related("ball").only(*_BATTLE_INSTANCE_FIELDS).ain_bulk(ids)
+
+
+def _order_teams(
+    by_id: dict[int, BallInstance], a_ids: Sequence[int], b_ids: Sequence[int]
+) -> tuple[list[BallInstance], list[BallInstance]]:
+    """
+    Rebuild both teams in the order their ids were given.
+
+    Raises
+    ------
+    KeyError
+        Some ids were not loaded, they are given as the only argument.
+    """
+    missing = [i for i in (*a_ids, *b_ids) if i not in by_id]
+    if missing:
+        raise KeyError(missing)
+    return [by_id[i] for i in a_ids], [by_id[i] for i in b_ids]
+
+
+def _media_filenames() -> set[str]:
+    with os.scandir("./admin_panel/media") as entries:
+        return {entry.name for entry in entries}
+
+
 async def save_file(attachment: discord.Attachment) -> Path:
-    path = Path(f"./admin_panel/media/{attachment.filename}")
-    match = FILENAME_RE.match(attachment.filename)
-    if not match:
+    base, _, extension = attachment.filename.rpartition(".")
+    if not base or not extension or any(c.isspace() for c in extension):
         raise TypeError("The file you uploaded lacks an extension.")
+    # list the folder once off the event loop rather than probing every candidate name
+    existing = await asyncio.to_thread(_media_filenames)
+    filename = attachment.filename
     i = 1
-    while path.exists():
-        path = Path(f"./admin_panel/media/{match.group(1)}-{i}{match.group(2)}")
+    while filename in existing:
+        filename = f"{base}-{i}.{extension}"
         i = i + 1
+    path = Path(f"./admin_panel/media/{filename}")
     await attachment.save(path)
     return path.relative_to("./admin_panel/media/")
 
@@ -79,38 +231,66 @@ async def _spawn_bomb(
 
     async def update_message_loop():
         nonlocal spawned, message
-        for i in range(5 * 12 * 10):  # timeout progress after 10 minutes
-            await edit_func(
-                content=f"Spawn bomb in progress in {channel.mention}, "
-                f"{settings.collectible_name.title()}: {countryball or 'Random'}\n"
-                f"{spawned}/{n} spawned ({round((spawned / n) * 100)}%)"
-            )
-            await asyncio.sleep(5)
+        start = time.monotonic()
+        deadline = start + 10 * 60  # timeout progress after 10 minutes
+        last_reported = -1
+        while time.monotonic() < deadline:
+            # only edit the message when progress changed
+            if spawned != last_reported:
+                last_reported = spawned
+                await edit_func(
+                    content=f"Spawn bomb in progress in {channel.mention}, "
+                    f"{settings.collectible_name.title()}: {countryball or 'Random'}\n"
+                    f"{spawned}/{n} spawned ({round((spawned / n) * 100)}%)"
+                )
+            # space edits out while much remains, and tighten them as the bomb nears its end
+            if spawned:
+                remaining = (n - spawned) * (time.monotonic() - start) / spawned
+                await asyncio.sleep(min(30, max(2, remaining / 4)))
+            else:
+                await asyncio.sleep(5)
         await edit_func(content="Spawn bomb seems to have timed out.")
 
-    message = await ctx.send(f"Starting spawn bomb in {channel.mention}...", ephemeral=True)
-    edit_func = ctx.interaction.edit_original_response if ctx.interaction else message.edit
-    task = ctx.bot.loop.create_task(update_message_loop())
-    try:
-        for i in range(n):
-            if not countryball:
-                ball = await countryball_cls.get_random(ctx.bot)
-            else:
-                ball = countryball_cls(ctx.bot, countryball)
+    # the constructor arguments are the same for every spawn when the countryball is fixed
+    make_ball = partial(countryball_cls, ctx.bot, countryball) if countryball else None
+    # discord.py handles rate limits, the semaphore only bounds how many spawns are in flight
+    semaphore = asyncio.Semaphore(5)
+    failed = False
+
+    async def spawn_one():
+        nonlocal spawned, failed
+        async with semaphore:
+            # stop spawning as soon as one fails, the others would fail the same way
+            if failed:
+                return
+            ball = make_ball() if make_ball else await countryball_cls.get_random(ctx.bot)
             ball.special = special
             ball.atk_bonus = atk_bonus
             ball.hp_bonus = hp_bonus
-            result = await ball.spawn(channel)
-            if not result:
-                task.cancel()
-                await edit_func(
-                    content=f"A {settings.collectible_name} failed to spawn, probably "
-                    "indicating a lack of permissions to send messages "
-                    f"or upload files in {channel.mention}."
-                )
+            if not await ball.spawn(channel):
+                failed = True
                 return
             spawned += 1
+
+    message = await ctx.send(f"Starting spawn bomb in {channel.mention}...", ephemeral=True)
+    edit_func = ctx.interaction.edit_original_response if ctx.interaction else message.edit
+    task = ctx.bot.loop.create_task(update_message_loop())
+    try:
+        try:
+            # an error cancels the spawns still running or waiting, like the first error used to stop the loop
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(n):
+                    tg.create_task(spawn_one())
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0]
         task.cancel()
+        if failed:
+            await edit_func(
+                content=f"A {settings.collectible_name} failed to spawn, probably "
+                "indicating a lack of permissions to send messages "
+                f"or upload files in {channel.mention}."
+            )
+            return
         await edit_func(
             content=f"Successfully spawned {spawned} {settings.plural_collectible_name} in {channel.mention}!"
         )
@@ -250,7 +430,7 @@ async def balls_info(ctx: commands.Context[BallsDexBot], countryball_id: str):
         await ctx.send(f"The {settings.collectible_name} ID you gave is not valid.", ephemeral=True)
         return
     try:
-        ball = await BallInstance.objects.prefetch_related("player", "trade_player", "special").aget(id=pk)
+        ball = await BallInstance.objects.select_related("player", "trade_player", "special").aget(id=pk)
     except BallInstance.DoesNotExist:
         await ctx.send(f"The {settings.collectible_name} ID you gave does not exist.", ephemeral=True)
         return
@@ -258,21 +438,27 @@ async def balls_info(ctx: commands.Context[BallsDexBot], countryball_id: str):
     catch_time = (
         (ball.catch_date - ball.spawned_time).total_seconds() if ball.catch_date and ball.spawned_time else "N/A"
     )
+    caught_time = format_dt(ball.catch_date, style="R")
     admin_url = f"[View online](<{reverse('admin:bd_models_ballinstance_change', args=(ball.pk,))}>)"
     await ctx.send(
-        f"**{settings.collectible_name.title()} ID:** {ball.pk}\n"
-        f"**Player:** {ball.player}\n"
-        f"**Name:** {ball.countryball}\n"
-        f"**Attack:** {ball.attack}\n"
-        f"**Attack bonus:** {ball.attack_bonus}\n"
-        f"**Health bonus:** {ball.health_bonus}\n"
-        f"**Health:** {ball.health}\n"
-        f"**Special:** {ball.special.name if ball.special else None}\n"
-        f"**Caught at:** {format_dt(ball.catch_date, style='R')}\n"
-        f"**Spawned at:** {spawned_time}\n"
-        f"**Catch time:** {catch_time} seconds\n"
-        f"**Caught in:** {ball.server_id if ball.server_id else 'N/A'}\n"
-        f"**Traded:** {ball.trade_player}\n{admin_url}",
+        "\n".join(
+            (
+                f"**{settings.collectible_name.title()} ID:** {ball.pk}",
+                f"**Player:** {ball.player}",
+                f"**Name:** {ball.countryball}",
+                f"**Attack:** {ball.attack}",
+                f"**Attack bonus:** {ball.attack_bonus}",
+                f"**Health bonus:** {ball.health_bonus}",
+                f"**Health:** {ball.health}",
+                f"**Special:** {ball.special.name if ball.special else None}",
+                f"**Caught at:** {caught_time}",
+                f"**Spawned at:** {spawned_time}",
+                f"**Catch time:** {catch_time} seconds",
+                f"**Caught in:** {ball.server_id if ball.server_id else 'N/A'}",
+                f"**Traded:** {ball.trade_player}",
+                admin_url,
+            )
+        ),
         ephemeral=True,
     )
     log.info(f"{ctx.author} got info for {ball}({ball.pk}).", extra={"webhook": True})
@@ -312,6 +498,17 @@ async def balls_delete(ctx: commands.Context[BallsDexBot], countryball_id: str,
         log.info(f"{ctx.author} hard deleted {ball}({ball.pk}).", extra={"webhook": True})
 
 
+@transaction.atomic()
+def _record_transfer(ball: BallInstance, original_player: Player, player: Player):
+    # this is synchronous to allow an atomic transaction
+    # https://code.djangoproject.com/ticket/33882
+
+    # only the owner changes, don't write back every column
+    BallInstance.objects.filter(pk=ball.pk).update(player_id=player.pk)
+    trade = Trade.objects.create(player1=original_player, player2=player)
+    TradeObject.objects.create(trade=trade, ballinstance=ball, player=original_player)
+
+
 @balls.command(name="transfer")
 @checks.has_permissions("bd_models.change_ballinstance")
 async def balls_transfer(ctx: commands.Context[BallsDexBot], countryball_id: str, user: discord.User):
@@ -331,17 +528,14 @@ async def balls_transfer(ctx: commands.Context[BallsDexBot], countryball_id: str
         await ctx.send(f"The {settings.collectible_name} ID you gave is not valid.", ephemeral=True)
         return
     try:
-        ball = await BallInstance.objects.prefetch_related("player").aget(id=ballIdConverted)
+        ball = await BallInstance.objects.select_related("player").aget(id=ballIdConverted)
         original_player = ball.player
     except BallInstance.DoesNotExist:
         await ctx.send(f"The {settings.collectible_name} ID you gave does not exist.", ephemeral=True)
         return
     player, _ = await Player.objects.aget_or_create(discord_id=user.id)
+    await sync_to_async(_record_transfer)(ball, original_player, player)
     ball.player = player
-    await ball.asave()
-
-    trade = await Trade.objects.acreate(player1=original_player, player2=player)
-    await TradeObject.objects.acreate(trade=trade, ballinstance=ball, player=original_player)
     await ctx.send(f"Transfered {ball}({ball.pk}) from {original_player} to {user}.", ephemeral=True)
     log.info(f"{ctx.author} transferred {ball}({ball.pk}) from {original_player} to {user}.", extra={"webhook": True})
 
@@ -388,15 +582,15 @@ async def balls_reset(
     if not view.value:
         return
     if percentage:
-        balls = [x async for x in BallInstance.objects.filter(player=player)]
-        to_delete = random.sample(balls, int(len(balls) * (percentage / 100)))
-        for ball in to_delete:
-            if soft_delete:
-                ball.deleted = True
-                await ball.asave()
-            else:
-                await ball.adelete()
-        count = len(to_delete)
+        pks = [x async for x in BallInstance.objects.filter(player=player).values_list("pk", flat=True)]
+        sample = random.sample(pks, int(len(pks) * (percentage / 100)))
+        to_delete = BallInstance.all_objects.filter(pk__in=sample)
+        if soft_delete:
+            await to_delete.aupdate(deleted=True)
+        else:
+            # the returned total also includes cascaded rows such as trade objects
+            await to_delete.adelete()
+        count = len(sample)
     else:
         if soft_delete:
             count = await BallInstance.all_objects.filter(player=player).aupdate(deleted=True)
@@ -424,6 +618,18 @@ async def balls_count(ctx: commands.Context[BallsDexBot], *, flags: BallsCountFl
         filters["player__discord_id"] = flags.user.id
     await ctx.defer(ephemeral=True)
     qs = BallInstance.all_objects if flags.deleted else BallInstance.objects
+    if flags.exists_only:
+        # stops at the first matching row instead of counting all of them
+        exists = await qs.filter(**filters).aexists()
+        country = f"{flags.countryball.country} " if flags.countryball else ""
+        special_str = f"{flags.special.name} " if flags.special else ""
+        collectible = f"{special_str}{country}{settings.plural_collectible_name}"
+        if flags.user:
+            text = f"{flags.user} {'has' if exists else 'does not have any'} {collectible}."
+        else:
+            text = f"There {'are' if exists else 'are no'} {collectible}."
+        await ctx.send(text, ephemeral=True)
+        return
     balls = await qs.filter(**filters).acount()
     verb = "is" if balls == 1 else "are"
     country = f"{flags.countryball.country} " if flags.countryball else ""
@@ -463,15 +669,7 @@ async def battle_start(ctx: commands.Context[BallsDexBot], limit: int = 3, oppon
         return
 
     session_id = _new_session_id()
-    _battle_sessions[session_id] = {
-        "host": ctx.author.id,
-        "opponent": opponent.id,
-        "limit": limit,
-        "team_a": [],
-        "team_b": [],
-        "confirmed": {ctx.author.id: False, opponent.id: False},
-        "channel": ctx.channel.id,
-    }
+    _battle_sessions[session_id] = BattleSession(ctx.author.id, opponent.id, limit, ctx.channel)
 
     await ctx.send(
         f"Battle session `{session_id}` started between {ctx.author.mention} and {opponent.mention}.\n"
@@ -499,39 +697,40 @@ async def battle_add(ctx: commands.Context[BallsDexBot], session: str, instance_
         return
 
     uid = ctx.author.id
-    if uid not in (sess["host"], sess["opponent"]):
+    if uid not in (sess.host, sess.opponent):
         await ctx.send("You are not part of this session.", ephemeral=True)
         return
 
-    # fetch BallInstance and check ownership
-    try:
-        inst = await sync_to_async(BallInstance.objects.get)(pk=instance_id)
-    except Exception:
-        await ctx.send("BallInstance not found.", ephemeral=True)
-        return
+    team = sess.team_of(uid)
 
-    player = await _get_player(ctx.author)
-    if not player or inst.player.discord_id != ctx.author.id:
-        await ctx.send("You do not own that countryball instance.", ephemeral=True)
+    # in-memory checks first, so rejected adds don't cost a query
+    if len(team) + sess.pending_count(uid) >= sess.limit:
+        await ctx.send(f"Your team already has the maximum of {sess.limit} balls.", ephemeral=True)
         return
 
-    # determine which team to add to
-    if uid == sess["host"]:
-        team = sess["team_a"]
-    else:
-        team = sess["team_b"]
+    if instance_id in sess.members or instance_id in sess.pending:
+        await ctx.send("This instance is already added to the session.", ephemeral=True)
+        return
 
-    if len(team) >= sess["limit"]:
-        await ctx.send(f"Your team already has the maximum of {sess['limit']} balls.", ephemeral=True)
+    # instance ids are positive database big integers, the team arrays cannot hold anything else
+    if not 1 <= instance_id <= _MAX_BIGINT:
+        await ctx.send("You do not own a countryball instance with that id.", ephemeral=True)
         return
 
-    if instance_id in sess["team_a"] or instance_id in sess["team_b"]:
-        await ctx.send("This instance is already added to the session.", ephemeral=True)
+    # keep the id out of the team until it is verified, concurrent adds and confirmations still see it
+    sess.pending[instance_id] = uid
+    try:
+        # only ids are kept in the session, the instances are loaded in one query on confirmation
+        owned = await BallInstance.objects.filter(pk=instance_id, player__discord_id=uid).aexists()
+    finally:
+        del sess.pending[instance_id]
+    if not owned:
+        await ctx.send("You do not own a countryball instance with that id.", ephemeral=True)
         return
 
     team.append(instance_id)
-    sess["confirmed"][sess["host"]] = False
-    sess["confirmed"][sess["opponent"]] = False
+    sess.members.add(instance_id)
+    sess.reset_confirmations()
 
     await ctx.send(f"Added instance #{instance_id} to your team in session `{session}`.", ephemeral=True)
 
@@ -553,66 +752,67 @@ async def battle_confirm(ctx: commands.Context[BallsDexBot], session: str):
         return
 
     uid = ctx.author.id
-    if uid not in (sess["host"], sess["opponent"]):
+    if uid not in (sess.host, sess.opponent):
         await ctx.send("You are not part of this session.", ephemeral=True)
         return
 
+    if sess.pending:
+        await ctx.send("Some countryballs are still being added, please confirm again in a moment.", ephemeral=True)
+        return
+
     # ensure both players have at least one ball
-    if uid == sess["host"] and not sess["team_a"]:
+    if not sess.team_of(uid):
         await ctx.send("You must add at least one countryball before confirming.", ephemeral=True)
         return
-    if uid == sess["opponent"] and not sess["team_b"]:
-        await ctx.send("You must add at least one countryball before confirming.", ephemeral=True)
+
+    sess.confirm(uid)
+    if not (sess.host_confirmed and sess.opponent_confirmed):
+        await ctx.send("You have confirmed. Waiting for the other player...", ephemeral=True)
         return
 
-    sess["confirmed"][uid] = True
-    await ctx.send("You have confirmed. Waiting for the other player...", ephemeral=True)
+    # take the teams and end the session before any await, so that later adds or a repeated
+    # confirmation cannot change or replay this battle
+    a_ids = list(sess.team_a)
+    b_ids = list(sess.team_b)
+    _battle_sessions.pop(session, None)
 
-    # if both confirmed, run simulation
-    if all(sess["confirmed"].values()):
-        # load instances
-        a_ids = sess["team_a"]
-        b_ids = sess["team_b"]
-        a_list = [await sync_to_async(BallInstance.objects.get)(pk=i) for i in a_ids]
-        b_list = [await sync_to_async(BallInstance.objects.get)(pk=i) for i in b_ids]
+    # both confirmed, loading and simulating may exceed the 3 seconds Discord gives to respond
+    await ctx.defer(ephemeral=True)
+    ack = ctx.send("Both players confirmed, the battle is starting.", ephemeral=True)
+    _, by_id = await asyncio.gather(ack, _load_instances(a_ids + b_ids))
+    try:
+        a_list, b_list = _order_teams(by_id, a_ids, b_ids)
+    except KeyError as e:
+        await ctx.send(
+            f"BallInstance ids not found: {', '.join(map(str, e.args[0]))}. The battle session was cancelled.",
+            ephemeral=True,
+        )
+        return
 
-        from ballsdex.core.battle import TeamBattle
+    from ballsdex.core.battle import TeamBattle
 
-        battle = TeamBattle(a_list, b_list)
-        logs = battle.run()
+    battle = TeamBattle(a_list, b_list)
+    logs = await asyncio.to_thread(battle.run)
 
-        text = "\n".join(logs)
+    text = "\n".join(logs)
 
-        # save BattleRecord
-        try:
-            await sync_to_async(BattleRecord.objects.create)(
-                team_a={"ids": a_ids},
-                team_b={"ids": b_ids},
-                log=text,
-                winner=(
-                    "A"
-                    if any(p.current_hp > 0 for p in battle.team_a)
-                    and not any(p.current_hp > 0 for p in battle.team_b)
-                    else (
-                        "B"
-                        if any(p.current_hp > 0 for p in battle.team_b)
-                        and not any(p.current_hp > 0 for p in battle.team_a)
-                        else "draw"
-                    )
-                ),
-            )
-        except Exception:
-            log.exception("Failed to persist BattleRecord")
+    # results go to the channel the session was started in
+    channel = sess.channel
 
-        # send as txt file to channel
-        bio = io.BytesIO()
-        bio.write(text.encode("utf-8"))
-        bio.seek(0)
+    # short logs fit in a message, longer ones are sent as txt file to channel
+    if len(text) < 1900:
+        send = channel.send(f"```\n{text}\n```")
+    else:
+        # the joined text already exists, encode it once; BytesIO wraps the bytes and starts at position 0
         filename = f"battle_{session}.txt"
 
-        await ctx.channel.send(file=discord.File(bio, filename=filename))
-        # cleanup session
-        del _battle_sessions[session]
+        send = channel.send(file=discord.File(io.BytesIO(text.encode("utf-8")), filename=filename))
+
+    # saved in the background with other finished battles
+    _record_queue.put_nowait(
+        BattleRecord(team_a={"ids": a_ids}, team_b={"ids": b_ids}, log=text, winner=battle.winner)
+    )
+    await send
 
 
 @commands.command()
@@ -633,16 +833,15 @@ async def battle(ctx: commands.Context, *ids: int):
     b_ids = ids[half:]
 
     try:
-        a_list = [await sync_to_async(BallInstance.objects.get)(pk=i) for i in a_ids]
-        b_list = [await sync_to_async(BallInstance.objects.get)(pk=i) for i in b_ids]
-    except Exception:
-        await ctx.send("One or more BallInstance ids not found.")
+        a_list, b_list = _order_teams(await _load_instances([*a_ids, *b_ids]), a_ids, b_ids)
+    except KeyError as e:
+        await ctx.send(f"BallInstance ids not found: {', '.join(map(str, e.args[0]))}.")
         return
 
     from ballsdex.core.battle import TeamBattle
 
     battle = TeamBattle(a_list, b_list)
-    logs = battle.run()
+    logs = await asyncio.to_thread(battle.run)
 
     text = "\n".join(logs)
     pages = pagify(text, delims=["\n\n", "\n"], priority=True)
@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 import logging
 from collections import defaultdict
 from typing import TYPE_CHECKING, cast
@@ -24,6 +26,7 @@ from bd_models.models import Ball, GuildConfig
 from settings.models import settings
 
 from .balls import balls as balls_group
+from .balls import drain_battle_records, flush_battle_records, sweep_battle_sessions
 from .blacklist import blacklist as blacklist_group
 from .blacklist import blacklistguild as blacklist_guild_group
 from .flags import RarityFlags, StatusFlags
@@ -96,6 +99,8 @@ class Admin(commands.Cog):
 
     def __init__(self, bot: "BallsDexBot"):
         self.bot = bot
+        self.session_sweeper: asyncio.Task[None] | None = None
+        self.record_flusher: asyncio.Task[None] | None = None
 
         self.admin.add_command(info_group)
         self.admin.add_command(balls_group)
@@ -128,6 +133,17 @@ class Admin(commands.Cog):
             )
         ]
         self.bot.tree.add_command(self.admin.app_command, guilds=guilds)
+        self.session_sweeper = asyncio.create_task(sweep_battle_sessions())
+        self.record_flusher = asyncio.create_task(flush_battle_records())
+
+    async def cog_unload(self):
+        if self.session_sweeper:
+            self.session_sweeper.cancel()
+        if self.record_flusher:
+            self.record_flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.record_flusher
+        await drain_battle_records()
 
     @commands.hybrid_group()
     @app_commands.guilds(0)
@@ -50,6 +50,7 @@ class BallsCountFlags(FlagConverter):
     countryball: BallTransform | None = flag(description="Restrict countring to a specific countryball")
     special: SpecialTransform | None = flag(description="Restrict counting to a special event")
     deleted: bool = flag(default=False, description="Count the deleted countryballs too")
+    exists_only: bool = flag(default=False, description="Only check whether any matching countryball exists")
 
 
 class TradeHistoryFlags(FlagConverter):